@@ -1,12 +1,11 @@
 """Tetris game."""
 from __future__ import annotations
 
-import functools
-import itertools
 import random
 import tkinter
+from array import array
 from tkinter import ttk
-from typing import Dict, Iterator, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from porcupine import get_tab_manager, menubar, tabs, utils
 
@@ -46,6 +45,41 @@ SHAPES: Dict[ShapeLetter, List[Point]] = {
     # fmt: on
 }
 
+# the whole board fits in one int: bit y*WIDTH+x is set when (x, y) is
+# occupied by a frozen square (see Game._board)
+FULL_ROW = (1 << WIDTH) - 1
+ROW_MASKS = [FULL_ROW << (y * WIDTH) for y in range(HEIGHT)]
+
+# blocks start a couple rows above the top of the game
+COLUMN_MASKS = [sum(1 << (y * WIDTH + x) for y in range(HEIGHT + 4)) for x in range(WIDTH)]
+
+# how many different rotations each shape cycles through: the O doesn't
+# rotate at all, and rotating I, S or Z twice must undo the rotation so
+# that they wiggle around the center instead of moving across the game
+_ROTATION_COUNTS = {"O": 1, "I": 2, "S": 2, "Z": 2}  # everything else rotates 4 ways
+
+
+def _create_rotations(shape: List[Point], count: int) -> Tuple[array[int], ...]:
+    result = []
+    for junk in range(count):
+        # flat [x0, y0, x1, y1, ...] in one contiguous buffer instead of a
+        # tuple of tuples, so iterating doesn't unpack a tuple per square
+        result.append(array("b", [value for point in shape for value in point]))
+        shape = [(-y, x) for (x, y) in shape]
+    return tuple(result)
+
+
+# there are only 7 shapes and at most 4 rotations each, so all of them
+# can be computed when this file is imported and rotating a block never
+# needs to compute new coordinates
+ROTATIONS: Dict[ShapeLetter, Tuple[array[int], ...]] = {
+    letter: _create_rotations(shape, _ROTATION_COUNTS.get(letter, 4))
+    for letter, shape in SHAPES.items()
+}
+
+# random.choice() needs a sequence, no need to recreate it for every block
+SHAPE_LETTERS = tuple(SHAPES)
+
 
 class Block:
     """The block that is currently moving down the game.
@@ -56,7 +90,8 @@ class Block:
     def __init__(self, game: Game, shape_letter: ShapeLetter) -> None:
         self._game = game
         self.shape_letter = shape_letter
-        self.shape = SHAPES[shape_letter].copy()
+        self._rotations = ROTATIONS[shape_letter]
+        self._rotation = 0
         self.x = WIDTH // 2
         self.y = HEIGHT
 
@@ -65,72 +100,81 @@ class Block:
         return f"<{self.shape_letter}-shaped {type(self).__name__} at ({self.x}, {self.y})>"
 
     def get_coords(self) -> Iterator[Point]:
-        for shapex, shapey in self.shape:
-            yield (self.x + shapex, self.y + shapey)
+        state = self._rotations[self._rotation]
+        for i in range(0, len(state), 2):
+            yield (self.x + state[i], self.y + state[i + 1])
 
     def bumps(self, x: int, y: int) -> bool:
-        return x not in range(WIDTH) or y < 0 or (x, y) in self._game.frozen_squares
+        return x < 0 or x >= WIDTH or y < 0 or bool(self._game._board & (1 << (y * WIDTH + x)))
 
     def _move(self, deltax: int, deltay: int) -> bool:
-        for x, y in self.get_coords():
-            if self.bumps(x + deltax, y + deltay):
+        # this runs for every autorepeated keypress, so iterate the rotation
+        # table directly and do the bumps() check inline without the method
+        # call and range(WIDTH) allocation
+        board = self._game._board
+        newx = self.x + deltax
+        newy = self.y + deltay
+        state = self._rotations[self._rotation]
+        for i in range(0, len(state), 2):
+            x = newx + state[i]
+            y = newy + state[i + 1]
+            if x < 0 or x >= WIDTH or y < 0 or board & (1 << (y * WIDTH + x)):
                 return False
 
-        self.x += deltax
-        self.y += deltay
+        self.x = newx
+        self.y = newy
+        self._game.update_moving_coords()
         return True
 
-    move_left = functools.partialmethod(_move, -1, 0)
-    move_right = functools.partialmethod(_move, +1, 0)
-    move_down = functools.partialmethod(_move, 0, -1)
+    def move_left(self) -> bool:
+        return self._move(-1, 0)
+
+    def move_right(self) -> bool:
+        return self._move(+1, 0)
+
+    def move_down(self) -> bool:
+        return self._move(0, -1)
 
     def move_down_all_the_way(self) -> None:
-        while self.move_down():
-            pass
+        # instead of calling move_down() until it fails, compute how far the
+        # block can fall in one go: for each square, find the highest frozen
+        # square below it in the same column (bit_length gives that without
+        # looping) and take the smallest distance
+        board = self._game._board
+        drop = HEIGHT + 4
+        for x, y in self.get_coords():
+            frozen_below = board & COLUMN_MASKS[x] & ((1 << (y * WIDTH)) - 1)
+            if frozen_below:
+                # highest set bit is at obstacle_y*WIDTH + x
+                obstacle_y = (frozen_below.bit_length() - 1 - x) // WIDTH
+            else:
+                obstacle_y = -1  # the floor
+            drop = min(drop, y - obstacle_y - 1)
+
+        if drop > 0:
+            self.y -= drop
+            self._game.update_moving_coords()
 
     def rotate(self) -> bool:
-        new_shape: List[Point] = []
-        for old_x, old_y in self.shape:
-            x, y = -old_y, old_x
-            if self.bumps(self.x + x, self.y + y):
+        if len(self._rotations) == 1:
+            # the O doesn't rotate
+            return False
+
+        new_rotation = (self._rotation + 1) % len(self._rotations)
+        state = self._rotations[new_rotation]
+        for i in range(0, len(state), 2):
+            if self.bumps(self.x + state[i], self.y + state[i + 1]):
                 return False
-            new_shape.append((x, y))
 
-        self.shape[:] = new_shape
+        self._rotation = new_rotation
+        self._game.update_moving_coords()
         return True
 
 
-class NonRotatingBlock(Block):
-    def rotate(self) -> bool:
-        return False
-
-
-class TwoRotationsBlock(Block):
-
-    _rotations: Optional[Iterator[List[Point]]] = None
-
-    def rotate(self) -> bool:
-        if self._rotations is None:
-            # running this for the first time
-            before = self.shape.copy()
-            if not super().rotate():
-                # bumping into a wall, maybe we can do something next time
-                return False
-            after = self.shape.copy()
-            self._rotations = itertools.cycle([before, after])
-            return True
-
-        else:
-            new_shape = next(self._rotations)
-            for x, y in new_shape:
-                if self.bumps(self.x + x, self.y + y):
-                    # restore self._rotations back to the state before
-                    # calling this method to make things look like
-                    # nothing happened
-                    next(self._rotations)
-                    return False
-            self.shape = new_shape
-            return True
+# state files written by old porcupines (see TetrisTab.get_state) contain
+# pickled instances of these former Block subclasses
+NonRotatingBlock = Block
+TwoRotationsBlock = Block
 
 
 class Game:
@@ -138,11 +182,26 @@ class Game:
     moving_block: Block
 
     def __init__(self) -> None:
+        # the bitboard is used for collision checks because it's much faster
+        # than hashing a Point for every square of every attempted move, and
+        # the dict maps each frozen square to its shape letter for rendering
+        self._board = 0
         self.frozen_squares: Dict[Point, str] = {}
         self.score = 0  # each new block increments score
         self.add_block()  # creates self.moving_block
         self.paused = False  # only used outside this class definition
 
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if "_board" not in state:
+            # state file written by an old porcupine that kept everything in
+            # frozen_squares: rebuild the bitboard from it, and replace the
+            # moving block because old blocks lack the rotation table
+            self._board = 0
+            for x, y in self.frozen_squares:
+                self._board |= 1 << (y * WIDTH + x)
+            self.add_block()
+
     @property
     def level(self) -> int:
         # levels start at 1
@@ -154,40 +213,54 @@ class Game:
         return 300 - (30 * self.level)
 
     def add_block(self) -> None:
-        letter = random.choice(list(SHAPES.keys()))
-        if letter == "O":
-            self.moving_block = NonRotatingBlock(self, letter)
-        elif letter in {"I", "S", "Z"}:
-            self.moving_block = TwoRotationsBlock(self, letter)
-        else:
-            self.moving_block = Block(self, letter)
-
-    def shape_at(self, x: int, y: int) -> Optional[ShapeLetter]:
-        try:
-            return self.frozen_squares[(x, y)]
-        except KeyError:
-            assert self.moving_block is not None
-            if (x, y) in self.moving_block.get_coords():
-                return self.moving_block.shape_letter
-            return None
+        self.moving_block = Block(self, random.choice(SHAPE_LETTERS))
+        self.update_moving_coords()
+
+    def update_moving_coords(self) -> None:
+        """Blocks call this whenever they have moved or rotated.
+
+        The renderer reads this set so that it doesn't need to loop over
+        the moving block's coordinates for every square it draws.
+        """
+        self._moving_coords = frozenset(self.moving_block.get_coords())
+
+    def get_colors(self) -> List[str]:
+        """Return the color of every square as a flat list indexed y*WIDTH+x.
+
+        Empty squares are "". Looping over the occupied squares here is
+        much faster than looking up all WIDTH*HEIGHT squares one by one
+        from the rendering code.
+        """
+        colors = [""] * (WIDTH * HEIGHT)
+        moving_color = COLORS[self.moving_block.shape_letter]
+        for x, y in self._moving_coords:
+            if y < HEIGHT:
+                colors[y * WIDTH + x] = moving_color
+        # frozen squares win if the moving block overlaps them (game over)
+        for (x, y), letter in self.frozen_squares.items():
+            if y < HEIGHT:
+                colors[y * WIDTH + x] = COLORS[letter]
+        return colors
 
     def freeze_moving_block(self) -> None:
         for x, y in self.moving_block.get_coords():
+            self._board |= 1 << (y * WIDTH + x)
             self.frozen_squares[(x, y)] = self.moving_block.shape_letter
 
     def delete_full_lines(self) -> None:
-        # this is much easier with a nested list
-        lines = []
-        for y in range(HEIGHT):
-            line = [self.frozen_squares.pop((x, y), None) for x in range(WIDTH)]
-            if None in line:
-                # it's not full, we can keep it
-                lines.append(line)
-
-        for y, line in enumerate(lines):
-            for x, value in enumerate(line):
-                if value is not None:
-                    self.frozen_squares[(x, y)] = value
+        y = 0
+        while y < HEIGHT:
+            if self._board & ROW_MASKS[y] == ROW_MASKS[y]:
+                # delete row y by shifting everything above it down one row
+                below = (1 << (y * WIDTH)) - 1
+                self._board = (self._board & below) | ((self._board >> WIDTH) & ~below)
+                self.frozen_squares = {
+                    (x, old_y if old_y < y else old_y - 1): letter
+                    for (x, old_y), letter in self.frozen_squares.items()
+                    if old_y != y
+                }
+            else:
+                y += 1
 
     def do_something(self) -> None:
         if self.moving_block.move_down():
@@ -200,7 +273,7 @@ class Game:
 
     def game_over(self) -> bool:
         """Return True if the game is over."""
-        return any((x, HEIGHT) in self.frozen_squares for x in range(WIDTH))
+        return bool(self._board & (FULL_ROW << (HEIGHT * WIDTH)))
 
 
 COLORS: Dict[ShapeLetter, str] = {
@@ -247,20 +320,34 @@ class TetrisTab(tabs.Tab):
         self._canvas.bind("<<Tetris:NewGame>>", (lambda event: self.new_game()), add=True)
         self._canvas.bind("<<Tetris:Pause>>", self._toggle_pause, add=True)
 
-        self._canvas_content = {}
-        for x in range(WIDTH):
-            for y in range(HEIGHT):
-                left = x * SCALE
-                bottom = (HEIGHT - y) * SCALE
-                self._canvas_content[(x, y)] = self._canvas.create_rectangle(
-                    left, bottom - SCALE, left + SCALE, bottom, outline="black", fill="black"
-                )
+        # the game is drawn into one image instead of 200 separate
+        # rectangle items, so updating a row of squares is a single bulk
+        # pixel put instead of lots of itemconfig tcl calls
+        self._image = tkinter.PhotoImage(width=WIDTH * SCALE, height=HEIGHT * SCALE)
+        # typeshed only knows the 2-tuple form of 'to', the 4-tuple is valid
+        self._image.put("black", to=(0, 0, WIDTH * SCALE, HEIGHT * SCALE))  # type: ignore[arg-type]
+        self._canvas.create_image(0, 0, anchor="nw", image=self._image)
+
+        # remember what colors each row has so that only changed rows are put
+        self._last_rows: List[Optional[Tuple[str, ...]]] = [None] * HEIGHT
 
         self._timeout_id: Optional[str] = None
         self._game_over_id: Optional[int] = None
+        self._refresh_pending = False
+
+        # each new game bumps this, and timeouts scheduled for a previous
+        # game notice that and stop instead of double-firing (possible if
+        # new_game() runs while a timeout is already being handled)
+        self._timer_gen = 0
 
+        self.bind("<<TabSelected>>", self._on_tab_selected, add=True)
+
+    def _on_tab_selected(self, event: tkinter.Event[tkinter.Misc]) -> None:
         # yes, this needs force for some reason
-        self.bind("<<TabSelected>>", (lambda event: self._canvas.focus_force()), add=True)
+        self._canvas.focus_force()
+        # the game kept running while another tab was selected and redraws
+        # were skipped, so show the current state now
+        self._schedule_refresh()
 
     def _toggle_pause(self, event: tkinter.Event[tkinter.Misc]) -> None:
         if not self._game.game_over():
@@ -284,17 +371,36 @@ class TetrisTab(tabs.Tab):
             else:
                 raise ValueError(f"unknown keysym {event.keysym!r}")
 
-        self._refresh()
+        self._schedule_refresh()
         return "break"
 
+    def _schedule_refresh(self) -> None:
+        # key autorepeat can fire keypresses faster than redrawing makes
+        # sense, so coalesce them: the first request schedules a refresh
+        # on tk's idle loop and the rest do nothing until it has run
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self._do_refresh)
+
+    def _do_refresh(self) -> None:
+        self._refresh_pending = False
+        self._refresh()
+
     def _refresh(self) -> None:
-        for (x, y), item_id in self._canvas_content.items():
-            shape = self._game.shape_at(x, y)
-            if shape is None:
-                color = self._canvas["bg"]
-            else:
-                color = COLORS[shape]
-            self._canvas.itemconfig(item_id, fill=color)
+        background = self._canvas["bg"]
+        colors = self._game.get_colors()
+        for y in range(HEIGHT):
+            base = y * WIDTH
+            row = tuple(color or background for color in colors[base : base + WIDTH])
+
+            if row != self._last_rows[y]:
+                self._last_rows[y] = row
+                # each color repeated SCALE times is one image row, and the
+                # to rectangle makes tk repeat that row SCALE times downwards
+                data = "{" + " ".join(" ".join([color] * SCALE) for color in row) + "}"
+                top = (HEIGHT - 1 - y) * SCALE
+                to = (0, top, WIDTH * SCALE, top + SCALE)
+                self._image.put(data, to=to)  # type: ignore[arg-type]
 
         self._score_label["text"] = f"Score {self._game.score}, level {self._game.level}\n" + (
             "Paused" if self._game.paused else ""
@@ -308,13 +414,19 @@ class TetrisTab(tabs.Tab):
             self._game_over_id = None
 
         self._game = Game()
+        self._timer_gen += 1
         self._refresh()
-        self._on_timeout()
+        self._on_timeout(self._timer_gen)
+
+    def _on_timeout(self, timer_gen: int) -> None:
+        if timer_gen != self._timer_gen:
+            # a new game was started, this timer belongs to the old one
+            return
 
-    def _on_timeout(self) -> None:
         if not self._game.paused:
             self._game.do_something()
-            self._refresh()
+            if get_tab_manager().select() is self:
+                self._schedule_refresh()
 
             if self._game.game_over():
                 centerx = int(self._canvas["width"]) // 2
@@ -334,7 +446,7 @@ class TetrisTab(tabs.Tab):
                 )
                 return
 
-        self._timeout_id = self.after(self._game.delay, self._on_timeout)
+        self._timeout_id = self.after(self._game.delay, self._on_timeout, timer_gen)
 
     def get_state(self) -> Game:
         return self._game  # it should be picklable
@@ -344,8 +456,9 @@ class TetrisTab(tabs.Tab):
         game.paused = True
         self = cls(manager)
         self._game = game
+        self._timer_gen += 1
         self._refresh()
-        self._on_timeout()
+        self._on_timeout(self._timer_gen)
         return self
 
 
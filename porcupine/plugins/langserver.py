@@ -38,6 +38,13 @@ setup_after = ["python_venv"]
 # still sometimes takes two reads to get everything (that's fine)
 CHUNK_SIZE = 64 * 1024
 
+# Polling the langserver process 20 times per second forever wastes cpu (and
+# laptop battery) when nothing is happening. When polls come up empty, the
+# delay between them is doubled until it hits the maximum, and it goes back
+# to the minimum whenever something is sent to or received from the process.
+MIN_POLL_DELAY_MS = 50
+MAX_POLL_DELAY_MS = 800
+
 
 class SubprocessStdIO:
     def __init__(self, process: subprocess.Popen[bytes]) -> None:
@@ -297,6 +304,19 @@ class LangServer:
         self.log = log
         self.tabs_opened: set[tabs.FileTab] = set()
         self._is_shutting_down_cleanly = False
+        self._poll_delay = MIN_POLL_DELAY_MS
+        self._poll_id: Optional[str] = None
+
+        # didChange notifications are batched so that a quick burst of
+        # keystrokes becomes one notification (the LSP allows several content
+        # changes per didChange)
+        self._pending_changes: dict[tabs.FileTab, list[lsp.TextDocumentContentChangeEvent]] = {}
+        self._change_flush_id: Optional[str] = None
+
+        # building a uri from the path is surprisingly not cheap, and it's
+        # needed on every change notification, so cache it while the tab is
+        # open (tabs get closed and reopened when their path changes)
+        self._uris: dict[tabs.FileTab, str] = {}
 
         self._io: Union[SubprocessStdIO, LocalhostSocketIO]
         if the_id.port is None:
@@ -361,7 +381,9 @@ class LangServer:
 
         # yes, None and b'' have a different meaning here
         if received_bytes is None:
-            # no data received
+            # no data received, back off so that an idle langserver isn't
+            # polled at full speed forever
+            self._poll_delay = min(2 * self._poll_delay, MAX_POLL_DELAY_MS)
             return True
         elif received_bytes == b"":
             # stdout or langserver socket is closed. Communicating with the
@@ -373,7 +395,8 @@ class LangServer:
             return False
 
         assert received_bytes
-        self.log.debug(f"got {len(received_bytes)} bytes of data")
+        self._poll_delay = MIN_POLL_DELAY_MS
+        self.log.debug("got %d bytes of data", len(received_bytes))
 
         for lsp_event in self._lsp_client.recv(received_bytes):
             try:
@@ -389,7 +412,7 @@ class LangServer:
 
         self._lsp_client.did_open(
             lsp.TextDocumentItem(
-                uri=tab.path.as_uri(),
+                uri=self._uris[tab],
                 languageId=config.language_id,
                 text=tab.textwidget.get("1.0", "end - 1 char"),
                 version=next(self._version_counter),
@@ -397,7 +420,10 @@ class LangServer:
         )
 
     def _handle_lsp_event(self, lsp_event: lsp.Event) -> None:
-        self.log.debug(f"handling event: {lsp_event}")
+        # lazy %s formatting matters here: diagnostics and completion events
+        # can be huge, and they arrive on every edit, so they shouldn't be
+        # turned into strings unless debug logging is actually enabled
+        self.log.debug("handling event: %s", lsp_event)
 
         if isinstance(lsp_event, lsp.Shutdown):
             self.log.debug("langserver sent Shutdown event")
@@ -420,7 +446,7 @@ class LangServer:
 
         # rest of these need the langserver to be active
         if not self._is_in_langservers():
-            self.log.warning(f"ignoring event because langserver is shutting down: {lsp_event}")
+            self.log.warning("ignoring event because langserver is shutting down: %s", lsp_event)
             return
 
         if isinstance(lsp_event, lsp.Initialized):
@@ -449,7 +475,15 @@ class LangServer:
             tab, req = self._autocompletion_requests.pop(lsp_event.message_id)
             if tab not in self.tabs_opened:
                 # I wouldn't be surprised if some langserver sent completions to closed tabs
-                self.log.debug(f"Completion sent to closed tab: {lsp_event}")
+                self.log.debug("Completion sent to closed tab: %s", lsp_event)
+                return
+
+            assert lsp_event.completion_list is not None
+            if not lsp_event.completion_list.items:
+                tab.event_generate(
+                    "<<AutoCompletionResponse>>",
+                    data=autocomplete.Response(id=req.id, completions=[]),
+                )
                 return
 
             # this is "open to interpretation", as the lsp spec says
@@ -460,7 +494,9 @@ class LangServer:
             assert match is not None
             prefix_len = len(match.group(1))
 
-            assert lsp_event.completion_list is not None
+            # same for all items, don't ask the text widget once per item
+            replace_start = tab.textwidget.index(f"{req.cursor_pos} - {prefix_len} chars")
+
             tab.event_generate(
                 "<<AutoCompletionResponse>>",
                 data=autocomplete.Response(
@@ -468,9 +504,7 @@ class LangServer:
                     completions=[
                         autocomplete.Completion(
                             display_text=item.label,
-                            replace_start=tab.textwidget.index(
-                                f"{req.cursor_pos} - {prefix_len} chars"
-                            ),
+                            replace_start=replace_start,
                             replace_end=req.cursor_pos,
                             replace_text=item.insertText or item.label,
                             # TODO: is slicing necessary here?
@@ -490,13 +524,11 @@ class LangServer:
 
         if isinstance(lsp_event, lsp.PublishDiagnostics):
             matching_tabs = [
-                tab
-                for tab in self.tabs_opened
-                if tab.path is not None and tab.path.as_uri() == lsp_event.uri
+                tab for tab in self.tabs_opened if self._uris.get(tab) == lsp_event.uri
             ]
             if not matching_tabs:
                 # Some langservers send diagnostics to closed tabs
-                self.log.debug(f"PublishDiagnostics sent to closed tab: {lsp_event}")
+                self.log.debug("PublishDiagnostics sent to closed tab: %s", lsp_event)
                 return
             [tab] = matching_tabs
 
@@ -560,15 +592,27 @@ class LangServer:
         raise NotImplementedError(repr(lsp_event))
 
     def run_stuff(self) -> None:
+        self._poll_id = None
         if self._run_stuff_once():
-            get_tab_manager().after(50, self.run_stuff)
+            self._poll_id = get_tab_manager().after(self._poll_delay, self.run_stuff)
+
+    def _wake_up_soon(self) -> None:
+        # called whenever something is sent to the langserver so that the
+        # response isn't stuck waiting behind a backed-off poll delay
+        self._poll_delay = MIN_POLL_DELAY_MS
+        if self._poll_id is not None:
+            get_tab_manager().after_cancel(self._poll_id)
+            self._poll_id = get_tab_manager().after(MIN_POLL_DELAY_MS, self.run_stuff)
 
     def open_tab(self, tab: tabs.FileTab) -> None:
         assert tab not in self.tabs_opened
+        assert tab.path is not None
         self.tabs_opened.add(tab)
+        self._uris[tab] = tab.path.as_uri()
         self.log.debug("tab opened")
         if self._lsp_client.state == lsp.ClientState.NORMAL:
             self._send_tab_opened_message(tab)
+            self._wake_up_soon()
 
     def forget_tab(self, tab: tabs.FileTab, *, may_shutdown: bool = True) -> None:
         if not self._is_in_langservers():
@@ -577,7 +621,9 @@ class LangServer:
             )
             return
 
+        self._flush_change_events()
         self.tabs_opened.remove(tab)
+        del self._uris[tab]
         self.log.debug("tab closed")
 
         if may_shutdown and not self.tabs_opened:
@@ -587,6 +633,7 @@ class LangServer:
 
             if self._lsp_client.state == lsp.ClientState.NORMAL:
                 self._lsp_client.shutdown()
+                self._wake_up_soon()
             else:
                 # it was never fully started
                 self._process.kill()
@@ -598,11 +645,15 @@ class LangServer:
             )
             return
 
+        # the langserver must see the changes that are still waiting for the
+        # flush timer, or it would complete against outdated text
+        self._flush_change_events()
+
         assert tab.path is not None
         request = event.data_class(autocomplete.Request)
         lsp_id = self._lsp_client.completion(
             text_document_position=lsp.TextDocumentPosition(
-                textDocument=lsp.TextDocumentIdentifier(uri=tab.path.as_uri()),
+                textDocument=lsp.TextDocumentIdentifier(uri=self._uris[tab]),
                 position=_position_tk2lsp(request.cursor_pos),
             ),
             context=lsp.CompletionContext(
@@ -614,17 +665,20 @@ class LangServer:
 
         assert lsp_id not in self._autocompletion_requests
         self._autocompletion_requests[lsp_id] = (tab, request)
+        self._wake_up_soon()
 
     def request_jump_to_definition(self, tab: tabs.FileTab) -> None:
         self.log.info(f"Jump to definition requested: {tab.path}")
+        self._flush_change_events()
         if tab.path is not None:
             request_id = self._lsp_client.definition(
                 lsp.TextDocumentPosition(
-                    textDocument=lsp.TextDocumentIdentifier(uri=tab.path.as_uri()),
+                    textDocument=lsp.TextDocumentIdentifier(uri=self._uris[tab]),
                     position=_position_tk2lsp(tab.textwidget.index("insert")),
                 )
             )
             self._jump2def_requests[request_id] = tab
+            self._wake_up_soon()
 
     def send_change_events(self, tab: tabs.FileTab, changes: textutils.Changes) -> None:
         if self._lsp_client.state != lsp.ClientState.NORMAL:
@@ -636,20 +690,41 @@ class LangServer:
             return
 
         assert tab.path is not None
-        self._lsp_client.did_change(
-            text_document=lsp.VersionedTextDocumentIdentifier(
-                uri=tab.path.as_uri(), version=next(self._version_counter)
-            ),
-            content_changes=[
-                lsp.TextDocumentContentChangeEvent(
-                    range=lsp.Range(
-                        start=_position_tk2lsp(change.start), end=_position_tk2lsp(change.end)
-                    ),
-                    text=change.new_text,
-                )
-                for change in changes.change_list
-            ],
+        self._pending_changes.setdefault(tab, []).extend(
+            lsp.TextDocumentContentChangeEvent(
+                range=lsp.Range(
+                    start=_position_tk2lsp(change.start), end=_position_tk2lsp(change.end)
+                ),
+                text=change.new_text,
+            )
+            for change in changes.change_list
         )
+        if self._change_flush_id is None:
+            self._change_flush_id = get_tab_manager().after(30, self._flush_change_events)
+
+    def _flush_change_events(self) -> None:
+        if self._change_flush_id is not None:
+            # cancelling an already fired timeout does nothing
+            get_tab_manager().after_cancel(self._change_flush_id)
+            self._change_flush_id = None
+
+        if not self._pending_changes:
+            return
+        pending = self._pending_changes
+        self._pending_changes = {}
+
+        if self._lsp_client.state != lsp.ClientState.NORMAL:
+            # the langserver went away while the changes were waiting
+            return
+
+        for tab, content_changes in pending.items():
+            self._lsp_client.did_change(
+                text_document=lsp.VersionedTextDocumentIdentifier(
+                    uri=self._uris[tab], version=next(self._version_counter)
+                ),
+                content_changes=content_changes,
+            )
+        self._wake_up_soon()
 
 
 langservers: Dict[LangServerId, LangServer] = {}
@@ -4,11 +4,13 @@ import contextlib
 import dataclasses
 import tkinter
 import weakref
-from functools import partial
-from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Optional, Tuple, overload
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, overload
 
 from pygments import styles  # type: ignore[import]
 
+import porcupine
 from porcupine import settings, utils
 
 if TYPE_CHECKING:
@@ -88,26 +90,146 @@ def count(widget: tkinter.Text, start: str, end: str, *, option: str = "-chars")
     return widget.tk.call(widget, "count", option, start, end)
 
 
+def _parse_index(index: str) -> Tuple[int, int]:
+    # parses an already resolved "line.column" string, without the list that
+    # split(".") would allocate (this runs for every keystroke)
+    dot = index.index(".")
+    return (int(index[:dot]), int(index[dot + 1 :]))
+
+
+# The body of this proc used to be defined again for every tracked widget,
+# with the widget-specific parts substituted in. Tcl byte-compiles proc bodies,
+# so defining it once and passing the widget-specific parts as arguments means
+# the compilation happens once per interpreter instead of once per widget.
+_TEXT_PROXY_PROC = """
+proc porcupine_text_proxy {fake_widget actual_widget change_event_from_command event_receiver args} {
+    # subcommand is e.g. insert, delete, replace, index, search, ...
+    # see text(3tk) for all possible subcommands
+    set subcommand [lindex $args 0]
+
+    # issue #5: don't let the cursor to go to the very top or bottom of
+    # the view
+    if {$subcommand == "see"} {
+        # cleaned_index is always a "LINE.COLUMN" string
+        set cleaned_index [$actual_widget index [lindex $args 1]]
+
+        # common case: the index and a few lines around it are already on
+        # screen, so there's nothing to scroll (bbox returns an empty string
+        # for indexes that are not visible)
+        if {[$actual_widget bbox "$cleaned_index - 4 lines"] != ""
+                && [$actual_widget bbox "$cleaned_index + 4 lines"] != ""} {
+            return
+        }
+
+        # from text(3tk): "If index is far out of view, then the
+        # command centers index in the window." and we want to center
+        # it correctly, so first go to the center, then a few
+        # characters around it, and finally back to center because it
+        # feels less error-prone that way
+        $actual_widget see $cleaned_index
+        $actual_widget see "$cleaned_index - 4 lines"
+        $actual_widget see "$cleaned_index + 4 lines"
+        $actual_widget see $cleaned_index
+        return
+    }
+
+    # only these subcommands can change the text, but they can also
+    # move the cursor by changing the text before the cursor
+    if {$subcommand == "delete" || $subcommand == "insert" || $subcommand == "replace"} {
+        # computing the change event is not cheap, and many tracked widgets
+        # (e.g. peers of the main widget) have nothing bound to
+        # <<ContentChanged>>, so check that first
+        set has_listeners ""
+        foreach tag [bindtags $event_receiver] {
+            if {[bind $tag <<ContentChanged>>] != ""} {
+                set has_listeners 1
+                break
+            }
+        }
+
+        if {$has_listeners == ""} {
+            # the edit can still move the cursor
+            set did_change 1
+        } else {
+            # Validate and clean up indexes here so that any problems
+            # result in Tcl error
+            if {$subcommand == "delete"} {
+                for {set i 1} {$i < [llength $args]} {incr i} {
+                    lset args $i [$actual_widget index [lindex $args $i]]
+                }
+            }
+            if {$subcommand == "insert"} {
+                lset args 1 [$actual_widget index [lindex $args 1]]
+            }
+            if {$subcommand == "replace"} {
+                lset args 1 [$actual_widget index [lindex $args 1]]
+                lset args 2 [$actual_widget index [lindex $args 2]]
+            }
+            # resolve 'end' here too, so that the callback doesn't need to
+            # come back to tcl just to normalize away the invisible newline
+            set end_index [$actual_widget index end]
+            set before_end [$actual_widget index "end - 1 char"]
+
+            # the callback queues the changes and generates <<ContentChanged>>
+            # later, it just returns "1" if something will actually change
+            set did_change [$change_event_from_command $fake_widget $end_index $before_end {*}$args]
+        }
+    } else {
+        set did_change ""
+    }
+
+    # it's important that this comes after the change cb stuff because
+    # this way it's possible to get old_length in self._change_cb()...
+    # however, it's also important that this is before the mark set
+    # stuff because the documented way to access the new index in a
+    # <<CursorMoved>> binding is getting it directly from the widget
+    set result [$actual_widget {*}$args]
+
+    # only[*] 'textwidget mark set insert new_location' can change the
+    # cursor position, because the cursor position is implemented as a
+    # mark named "insert" and there are no other commands that move
+    # marks
+    #
+    # [*] i lied, hehe >:D MUHAHAHA ... inserting text before the
+    # cursor also changes it
+    if {[lrange $args 0 2] == {mark set insert} || $did_change != ""} {
+        set new_pos [$actual_widget index insert]
+
+        # must be compared as strings: "1.10" != "1.1" is false, because tcl
+        # compares them as numbers
+        if {$new_pos ne $::porcupine_cursor_pos($fake_widget)} {
+            if {$new_pos eq [$actual_widget index end]} {
+                set new_pos [$actual_widget index "end - 1 char"]
+            }
+            if {$new_pos ne $::porcupine_cursor_pos($fake_widget)} {
+                set ::porcupine_cursor_pos($fake_widget) $new_pos
+                event generate $fake_widget <<CursorMoved>>
+            }
+        }
+    }
+
+    return $result
+}
+"""
+
+
 class _ChangeTracker:
 
     # event_receiver_widget will receive the change events
     def __init__(self, event_receiver_widget: tkinter.Text) -> None:
         self._event_receiver_widget = event_receiver_widget
         self._change_batch: Optional[List[Change]] = None
+        self._pending_changes: List[Change] = []
+        self._flush_id: Optional[str] = None
 
-    def setup(self, widget: tkinter.Text) -> None:
-        old_cursor_pos = widget.index("insert")  # must be widget specific
-
-        def cursor_pos_changed() -> None:
-            nonlocal old_cursor_pos
-
-            new_pos = widget.index("insert")
-            if new_pos == widget.index("end"):
-                new_pos = widget.index("end - 1 char")
+        # registered once here, because every after_idle() call would
+        # otherwise create a new tcl command just to schedule the flush
+        self._flush_command = event_receiver_widget.register(self._flush_changes)
 
-            if new_pos != old_cursor_pos:
-                old_cursor_pos = new_pos
-                widget.event_generate("<<CursorMoved>>")
+    def setup(self, widget: tkinter.Text) -> None:
+        # the proxy proc compares against this to decide when to generate
+        # <<CursorMoved>>, must be widget specific
+        widget.tk.call("set", f"porcupine_cursor_pos({widget})", widget.index("insert"))
 
         #       /\
         #      /  \  WARNING: serious tkinter magic coming up
@@ -146,93 +268,36 @@ class _ChangeTracker:
         widget.tk.call("rename", str(widget), actual_widget_command)
 
         # this part is tcl because i couldn't get a python callback to work
-        widget.tk.eval(
-            """
-        proc %(fake_widget)s {args} {
-            # subcommand is e.g. insert, delete, replace, index, search, ...
-            # see text(3tk) for all possible subcommands
-            set subcommand [lindex $args 0]
-
-            # issue #5: don't let the cursor to go to the very top or bottom of
-            # the view
-            if {$subcommand == "see"} {
-                # cleaned_index is always a "LINE.COLUMN" string
-                set cleaned_index [%(actual_widget)s index [lindex $args 1]]
-
-                # from text(3tk): "If index is far out of view, then the
-                # command centers index in the window." and we want to center
-                # it correctly, so first go to the center, then a few
-                # characters around it, and finally back to center because it
-                # feels less error-prone that way
-                %(actual_widget)s see $cleaned_index
-                %(actual_widget)s see "$cleaned_index - 4 lines"
-                %(actual_widget)s see "$cleaned_index + 4 lines"
-                %(actual_widget)s see $cleaned_index
-                return
-            }
-
-            # only these subcommands can change the text, but they can also
-            # move the cursor by changing the text before the cursor
-            if {$subcommand == "delete" || $subcommand == "insert" || $subcommand == "replace"} {
-                # Validate and clean up indexes here so that any problems
-                # result in Tcl error
-                if {$subcommand == "delete"} {
-                    for {set i 1} {$i < [llength $args]} {incr i} {
-                        lset args $i [%(actual_widget)s index [lindex $args $i]]
-                    }
-                }
-                if {$subcommand == "insert"} {
-                    lset args 1 [%(actual_widget)s index [lindex $args 1]]
-                }
-                if {$subcommand == "replace"} {
-                    lset args 1 [%(actual_widget)s index [lindex $args 1]]
-                    lset args 2 [%(actual_widget)s index [lindex $args 2]]
-                }
-                set prepared_event [%(change_event_from_command)s {*}$args]
-            } else {
-                set prepared_event ""
-            }
-
-            # it's important that this comes after the change cb stuff because
-            # this way it's possible to get old_length in self._change_cb()...
-            # however, it's also important that this is before the mark set
-            # stuff because the documented way to access the new index in a
-            # <<CursorMoved>> binding is getting it directly from the widget
-            set result [%(actual_widget)s {*}$args]
-
-            if {$prepared_event != ""} {
-                # must be after calling actual widget command
-                event generate %(event_receiver)s <<ContentChanged>> -data $prepared_event
-            }
+        if not widget.tk.eval("info procs porcupine_text_proxy"):
+            widget.tk.eval(_TEXT_PROXY_PROC)
+        # One tcl command is shared by all tracked widgets. Registering a
+        # command per widget with widget.register() would add an entry to the
+        # interpreter's command table for every widget, cleaned up only when
+        # the registering widget is destroyed.
+        if not widget.tk.eval("info commands porcupine_text_change_event"):
+            widget.tk.createcommand("porcupine_text_change_event", _change_event_dispatch)
+        _tracked_widgets[str(widget)] = (self, widget)
+
+        def forget_widget(junk: object) -> None:
+            _tracked_widgets.pop(str(widget), None)
+            widget.tk.call("unset", "-nocomplain", f"porcupine_cursor_pos({widget})")
+
+        widget.bind("<Destroy>", forget_widget, add=True)
 
-            # only[*] 'textwidget mark set insert new_location' can change the
-            # cursor position, because the cursor position is implemented as a
-            # mark named "insert" and there are no other commands that move
-            # marks
-            #
-            # [*] i lied, hehe >:D MUHAHAHA ... inserting text before the
-            # cursor also changes it
-            if {[lrange $args 0 2] == {mark set insert} || $prepared_event != ""} {
-                %(cursor_moved_callback)s
-            }
-
-            return $result
-        }
-        """
+        widget.tk.eval(
+            "proc %(fake_widget)s {args} {porcupine_text_proxy"
+            " %(fake_widget)s %(actual_widget)s porcupine_text_change_event"
+            " %(event_receiver)s {*}$args}"
             % {
                 "fake_widget": str(widget),
                 "actual_widget": actual_widget_command,
-                "change_event_from_command": widget.register(
-                    partial(self._change_event_from_command, widget)
-                ),
                 "event_receiver": self._event_receiver_widget,
-                "cursor_moved_callback": widget.register(cursor_pos_changed),
             }
         )
 
     def _create_change(self, widget: tkinter.Text, start: str, end: str, new_text: str) -> Change:
-        start_line = int(start.split(".")[0])
-        end_line = int(end.split(".")[0])
+        start_line = _parse_index(start)[0]
+        end_line = _parse_index(end)[0]
         return Change(
             start=[start_line, count(widget, f"{start_line}.0", start)],
             end=[end_line, count(widget, f"{end_line}.0", end)],
@@ -240,9 +305,16 @@ class _ChangeTracker:
             new_text=new_text,
         )
 
-    # Must be called before widget content actually changes
+    # Must be called before widget content actually changes. The tcl proxy
+    # passes in pre-resolved indexes of 'end' and 'end - 1 char' so that this
+    # doesn't need to ask the widget for them.
     def _change_event_from_command(
-        self, widget: tkinter.Text, subcommand: str, *args_tuple: str
+        self,
+        widget: tkinter.Text,
+        end_index: str,
+        before_end: str,
+        subcommand: str,
+        *args_tuple: str,
     ) -> str:
         changes: List[Change] = []
 
@@ -252,10 +324,7 @@ class _ChangeTracker:
             # tk has a funny abstraction of an invisible newline character at
             # the end of file, it's always there but nothing else uses it, so
             # let's ignore it
-            args = list(args_tuple)
-            for index, old_arg in enumerate(args):
-                if old_arg == widget.index("end"):
-                    args[index] = widget.index("end - 1 char")
+            args = [before_end if arg == end_index else arg for arg in args_tuple]
 
             # "If index2 is not specified then the single character at index1
             # is deleted." and later: "If more indices are given, multiple
@@ -264,43 +333,45 @@ class _ChangeTracker:
             if len(args) % 2 == 1:
                 args.append(widget.index(f"{args[-1]} + 1 char"))
             assert len(args) % 2 == 0
-            pairs = list(zip(args[0::2], args[1::2]))
+
+            # the tcl proxy already resolved all indexes to "line.column"
+            # strings, so they can be compared as (line, column) int tuples
+            # without asking the widget
+            parsed = [_parse_index(arg) for arg in args]
 
             # "If index2 does not specify a position later in the text than
             # index1 then no characters are deleted."
-            pairs = [(start, end) for (start, end) in pairs if widget.compare(start, "<", end)]
+            pairs = [
+                (parsed[i], parsed[i + 1], args[i], args[i + 1])
+                for i in range(0, len(args), 2)
+                if parsed[i] < parsed[i + 1]
+            ]
 
             # "They [index pairs, aka ranges] are sorted [...]."
-            # (line, column) tuples sort nicely
-            def get_range_beginning_as_tuple(start_and_end: Tuple[str, str]) -> Tuple[int, int]:
-                line, column = map(int, start_and_end[0].split("."))
-                return (line, column)
-
-            pairs.sort(key=get_range_beginning_as_tuple)
+            # (line, column) tuples sort nicely. Sort by range beginning only,
+            # so that ranges with the same beginning stay in the given order.
+            pairs.sort(key=lambda pair: pair[0])
 
             # "If multiple ranges with the same start index are given, then the
             # longest range is used. If overlapping ranges are given, then they
             # will be merged into spans that do not cause deletion of text
             # outside the given ranges due to text shifted during deletion."
-            def merge_index_ranges(
-                start1: str, end1: str, start2: str, end2: str
-            ) -> Tuple[str, str]:
-                start = start1 if widget.compare(start1, "<", start2) else start2
-                end = end1 if widget.compare(end1, ">", end2) else end2
-                return (start, end)
-
-            # loop through pairs of pairs
-            for i in range(len(pairs) - 2, -1, -1):
-                (start1, end1), (start2, end2) = pairs[i : i + 2]
-                if widget.compare(end1, ">=", start2):
+            #
+            # classic interval merging: each range either extends the previous
+            # merged range or starts a new one, because starts are sorted
+            merged = pairs[:1]
+            for pair in pairs[1:]:
+                if pair[0] <= merged[-1][1]:
                     # they overlap
-                    new_pair = merge_index_ranges(start1, end1, start2, end2)
-                    pairs[i : i + 2] = [new_pair]
+                    if pair[1] > merged[-1][1]:
+                        merged[-1] = (merged[-1][0], pair[1], merged[-1][2], pair[3])
+                else:
+                    merged.append(pair)
 
             # "[...] and the text is removed from the last range to the first
             # range so deleted text does not cause an undesired index shifting
             # side-effects."
-            for start, end in reversed(pairs):
+            for junk1, junk2, start, end in reversed(merged):
                 changes.append(self._create_change(widget, start, end, ""))
 
         # the man page's inserting section is also kind of a wall of
@@ -311,8 +382,8 @@ class _ChangeTracker:
             # "If index refers to the end of the text (the character after the
             # last newline) then the new text is inserted just before the last
             # newline instead."
-            if text_index == widget.index("end"):
-                text_index = widget.index("end - 1 char")
+            if text_index == end_index:
+                text_index = before_end
 
             # we don't care about the tagList arguments to insert, but we need
             # to handle the other arguments nicely anyway: "If multiple
@@ -322,20 +393,27 @@ class _ChangeTracker:
             # omitted." i'm not sure what "in order" means here, but i tried
             # it, and 'textwidget.insert('1.0', 'asd', [], 'toot', [])' inserts
             # 'asdtoot', not 'tootasd'
-            new_text = "".join(other_args[::2])
+            if len(other_args) == 1:
+                # the common case: one text argument, no tagLists
+                new_text = other_args[0]
+            else:
+                new_text = "".join(islice(other_args, 0, None, 2))
 
             changes.append(self._create_change(widget, text_index, text_index, new_text))
 
         # an even smaller wall of text that mostly refers to insert and replace
         elif subcommand == "replace":
             start, end, *other_args = args_tuple
-            new_text = "".join(other_args[::2])
+            if len(other_args) == 1:
+                new_text = other_args[0]
+            else:
+                new_text = "".join(islice(other_args, 0, None, 2))
 
             # more invisible newline garbage
-            if start == widget.index("end"):
-                start = widget.index("end - 1 char")
-            if end == widget.index("end"):
-                end = widget.index("end - 1 char")
+            if start == end_index:
+                start = before_end
+            if end == end_index:
+                end = before_end
 
             # didn't find in docs, but tcl throws an error for this
             assert widget.compare(start, "<=", end)
@@ -346,21 +424,49 @@ class _ChangeTracker:
             raise ValueError(f"unexpected subcommand: {subcommand}")
 
         # remove changes that don't actually do anything
-        changes = [
-            change
-            for change in changes
-            if change.start != change.end or change.old_text_len != 0 or change.new_text
-        ]
-
-        if self._change_batch is None:
-            return str(Changes(changes)) if changes else ""
+        if len(changes) == 1:
+            # the common case: a keystroke edit, no list rebuilding needed
+            change = changes[0]
+            if change.start == change.end and change.old_text_len == 0 and not change.new_text:
+                changes.clear()
         else:
+            changes = [
+                change
+                for change in changes
+                if change.start != change.end or change.old_text_len != 0 or change.new_text
+            ]
+
+        if self._change_batch is not None:
             self._change_batch.extend(changes)
             return ""  # don't generate event
+        if not changes:
+            return ""
+
+        # Generating one <<ContentChanged>> per change would run all the bound
+        # plugin callbacks (highlighting etc) once per change. During bulk
+        # edits, such as pasting or find/replace-all, that's hundreds of times.
+        # Instead the changes are queued and emitted as one event at idle time,
+        # when tk has nothing else to do.
+        self._pending_changes.extend(changes)
+        if self._flush_id is None:
+            self._flush_id = str(
+                self._event_receiver_widget.tk.call("after", "idle", self._flush_command)
+            )
+        return "1"
+
+    def _flush_changes(self) -> None:
+        if self._flush_id is not None:
+            self._event_receiver_widget.tk.call("after", "cancel", self._flush_id)
+            self._flush_id = None
+        if self._pending_changes and self._event_receiver_widget.winfo_exists():
+            changes = self._pending_changes
+            self._pending_changes = []
+            self._event_receiver_widget.event_generate("<<ContentChanged>>", data=Changes(changes))
 
     def begin_batch(self) -> None:
         if self._change_batch is not None:
             raise RuntimeError("nested calls to change_batch")
+        self._flush_changes()  # keep events in the same order as the changes
         self._change_batch = []
 
     def finish_batch(self) -> None:
@@ -378,6 +484,15 @@ _change_trackers: weakref.WeakKeyDictionary[
     tkinter.Text, _ChangeTracker
 ] = weakref.WeakKeyDictionary()
 
+# Keyed by widget path, used by the shared porcupine_text_change_event tcl
+# command. Entries are removed when the widget is destroyed.
+_tracked_widgets: Dict[str, Tuple[_ChangeTracker, tkinter.Text]] = {}
+
+
+def _change_event_dispatch(widget_path: str, *args: str) -> str:
+    tracker, widget = _tracked_widgets[widget_path]
+    return tracker._change_event_from_command(widget, *args)
+
 
 def track_changes(widget: tkinter.Text) -> None:
     """
@@ -424,6 +539,11 @@ def track_changes(widget: tkinter.Text) -> None:
         widget has already changed. Also, sometimes many changes are applied
         at once and ``change_list`` contains more than one item.
 
+        The event is generated at idle time, so that rapidly repeated changes
+        (e.g. find/replace-all) produce one event with a long ``change_list``
+        instead of many events. Use :func:`flush_changes` if you can't wait
+        until idle time.
+
     .. virtualevent:: CursorMoved
 
         This event is generated every time the user moves the cursor or
@@ -441,6 +561,22 @@ def track_changes(widget: tkinter.Text) -> None:
     _change_trackers[widget] = tracker
 
 
+def flush_changes(widget: tkinter.Text) -> None:
+    """Generate the pending ``<<ContentChanged>>`` event of *widget* right away.
+
+    Usually the event is generated at idle time, a moment after the text
+    actually changed (see :func:`track_changes`). Call this function first if
+    your code changes the text widget and then immediately needs whatever the
+    ``<<ContentChanged>>`` callbacks do.
+
+    This does nothing if *widget* isn't tracked with :func:`track_changes` or
+    there are no pending changes.
+    """
+    tracker = _change_trackers.get(widget)
+    if tracker is not None:
+        tracker._flush_changes()
+
+
 @contextlib.contextmanager
 def change_batch(widget: tkinter.Text) -> Iterator[None]:
     """A context manager to optimize doing many changes to a text widget.
@@ -542,6 +678,26 @@ def create_peer_widget(
         change_tracker.setup(the_widget_that_becomes_a_peer)
 
 
+# When the pygments style changes, this runs once per widget that displays the
+# style's colors, and get_style_by_name() does a non-trivial amount of work.
+@lru_cache(maxsize=8)
+def _get_style_colors(style_name: str) -> Tuple[str, str]:
+    style = styles.get_style_by_name(style_name)
+    bg = style.background_color
+
+    # yes, style.default_style can be '#rrggbb', '' or nonexistent
+    # this is undocumented
+    #
+    #   >>> from pygments.styles import *
+    #   >>> [getattr(get_style_by_name(name), 'default_style', '???')
+    #   ...  for name in get_all_styles()]
+    #   ['', '', '', '', '', '', '???', '???', '', '', '', '',
+    #    '???', '???', '', '#cccccc', '', '', '???', '', '', '', '',
+    #    '#222222', '', '', '', '???', '']
+    fg = getattr(style, "default_style", "") or utils.invert_color(bg)
+    return (fg, bg)
+
+
 # fmt: off
 @overload
 def use_pygments_theme(widget: tkinter.Misc, callback: Callable[[str, str], None]) -> None: ...
@@ -567,20 +723,17 @@ def use_pygments_theme(
         :source:`porcupine/plugins/highlight.py`.
     """
 
+    last_colors: Optional[Tuple[str, str]] = None
+
     def on_style_changed(junk: object = None) -> None:
-        style = styles.get_style_by_name(settings.get("pygments_style", str))
-        bg = style.background_color
+        nonlocal last_colors
+
+        fg, bg = _get_style_colors(settings.get("pygments_style", str))
+        if (fg, bg) == last_colors:
+            # configuring the widget would make it redraw for nothing
+            return
+        last_colors = (fg, bg)
 
-        # yes, style.default_style can be '#rrggbb', '' or nonexistent
-        # this is undocumented
-        #
-        #   >>> from pygments.styles import *
-        #   >>> [getattr(get_style_by_name(name), 'default_style', '???')
-        #   ...  for name in get_all_styles()]
-        #   ['', '', '', '', '', '', '???', '???', '', '', '', '',
-        #    '???', '???', '', '#cccccc', '', '', '???', '', '', '', '',
-        #    '#222222', '', '', '', '???', '']
-        fg = getattr(style, "default_style", "") or utils.invert_color(bg)
         if callback is None:
             assert isinstance(widget, tkinter.Text)
             widget.config(
@@ -597,6 +750,16 @@ def use_pygments_theme(
     on_style_changed()
 
 
+# Measuring a font does actual glyph measurement in tk, and this gets called
+# with the same few fonts over and over again.
+_font_measure_cache: Dict[str, int] = {}
+_font_measure_cache_bound = False
+
+
+def _clear_font_measure_cache(junk: object) -> None:
+    _font_measure_cache.clear()
+
+
 def config_tab_displaying(
     textwidget: tkinter.Text, indent_size: int, *, tag: Optional[str] = None
 ) -> None:
@@ -609,16 +772,32 @@ def config_tab_displaying(
     If ``tag`` is specified, then only the text tagged with the tag is
     affected, not the entire ``textwidget``.
     """
+    global _font_measure_cache_bound
+
     if tag is None:
         font = textwidget["font"]
     else:
         font = textwidget.tag_cget(tag, "font") or textwidget["font"]
 
-    # from the text(3tk) man page: "To achieve a different standard
-    # spacing, for example every 4 characters, simply configure the
-    # widget with “-tabs "[expr {4 * [font measure $font 0]}] left"
-    # -tabstyle wordprocessor”."
-    measure_result = int(textwidget.tk.call("font", "measure", font, "0"))
+    measure_result = _font_measure_cache.get(font)
+    if measure_result is None:
+        if not _font_measure_cache_bound:
+            # named fonts like TkFixedFont measure differently after the font
+            # settings change. The main window gets the setting change events
+            # before any other widget, so the cache is cleared before other
+            # widgets remeasure.
+            main_window = porcupine.get_main_window()
+            main_window.bind("<<SettingChanged:font_family>>", _clear_font_measure_cache, add=True)
+            main_window.bind("<<SettingChanged:font_size>>", _clear_font_measure_cache, add=True)
+            _font_measure_cache_bound = True
+
+        # from the text(3tk) man page: "To achieve a different standard
+        # spacing, for example every 4 characters, simply configure the
+        # widget with “-tabs "[expr {4 * [font measure $font 0]}] left"
+        # -tabstyle wordprocessor”."
+        measure_result = int(textwidget.tk.call("font", "measure", font, "0"))
+        _font_measure_cache[font] = measure_result
+
     textwidget.config(tabs=(indent_size * measure_result, "left"), tabstyle="wordprocessor")
 
 
@@ -637,7 +816,12 @@ class MainText(tkinter.Text):
         self.bind("<<Dedent>>", (lambda event: self.dedent("insert")), add=True)
 
     def _on_indent_size_changed(self, junk: object = None) -> None:
-        config_tab_displaying(self, self._tab.settings.get("indent_size", int))
+        indent_size = self._tab.settings.get("indent_size", int)
+        config_tab_displaying(self, indent_size)
+
+        # all the possible indentation strings, so that indent() doesn't
+        # allocate a new string on every Tab press
+        self._indent_strings = tuple(" " * i for i in range(indent_size + 1))
 
     def indent(self, location: str) -> None:
         """Insert indentation character(s) at the given location."""
@@ -648,9 +832,9 @@ class MainText(tkinter.Text):
         # we can't just add ' '*indent_size, for example,
         # if indent_size is 4 and there are 7 charaters we add 1 space
         indent_size = self._tab.settings.get("indent_size", int)
-        how_many_chars = int(self.index(location).split(".")[1])
+        how_many_chars = _parse_index(self.index(location))[1]
         space_count = indent_size - (how_many_chars % indent_size)
-        self.insert(location, " " * space_count)
+        self.insert(location, self._indent_strings[space_count])
 
     def dedent(self, location: str) -> bool:
         """Remove indentation character(s) if possible.
@@ -663,18 +847,22 @@ class MainText(tkinter.Text):
 
         This returns True if something was done, and False otherwise.
         """
+        # resolve the location once, the resolved "line.column" works as a
+        # location in the rest of the tcl calls
+        pos = self.index(location)
+
         if not self._tab.settings.get("tabs2spaces", bool):
-            if not self.index(location).endswith(".0"):
+            if not pos.endswith(".0"):
                 # not deleting from start of line, delete previous char instead
-                location = f"{location} - 1 char"
+                pos = self.index(f"{pos} - 1 char")
 
-            if self.get(location).isspace():
-                self.delete(location)
+            if self.get(pos).isspace():
+                self.delete(pos)
                 return True
             return False
 
-        lineno, column = map(int, self.index(location).split("."))
-        line = self.get(f"{location} linestart", f"{location} lineend")
+        lineno, column = _parse_index(pos)
+        line = self.get(f"{lineno}.0", f"{pos} lineend")
 
         indent_size = self._tab.settings.get("indent_size", int)
         start = column - (column % indent_size)  # round down to indent_size multiple
@@ -207,6 +207,7 @@ def find_project_root(project_file_path: Path) -> Path:
 
 
 # i know, i shouldn't do math with rgb colors, but this is good enough
+@functools.lru_cache(maxsize=100)
 def invert_color(color: str, *, black_or_white: bool = False) -> str:
     """Return a color with opposite red, green and blue values.
 
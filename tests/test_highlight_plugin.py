@@ -7,6 +7,7 @@ def test_deleting_bug(filetab):
 
     filetab.settings.set("pygments_lexer", PythonLexer)
     filetab.textwidget.insert("1.0", "return None")
+    filetab.update()
     assert tag_ranges("Token.Keyword") == ["1.0", "1.6"]
     assert tag_ranges("Token.Keyword.Constant") == ["1.7", "1.11"]
     assert tag_ranges("Token.Literal.String.Double") == []
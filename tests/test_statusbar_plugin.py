@@ -23,6 +23,7 @@ def test_reload_warning(filetab, tmp_path):
     assert statusbar.left_label["foreground"] != ""
 
     filetab.textwidget.insert("1.0", "a")  # assume user doesn't want changes back
+    filetab.update()
     assert statusbar.left_label["text"].endswith("lol.py")
     assert statusbar.left_label["foreground"] == ""
 
@@ -202,11 +202,13 @@ def test_peer_cursor_moved(text_and_events):
 def test_embedded_window(text_and_events):
     text, events = text_and_events
     text.insert("1.0", "abc")
+    text.update()
     assert events.pop().data_class(Changes).change_list == [
         Change(start=[1, 0], end=[1, 0], old_text_len=0, new_text="abc")
     ]
     text.window_create("1.0", window=tkinter.Button(text))
     text.insert("1.0 lineend", "xyz")
+    text.update()
 
     # Notice that text index says 4 counting button, change event says 3 ignoring button
     assert text.search("xyz", "1.0") == "1.4"